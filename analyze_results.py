@@ -9,8 +9,49 @@ import re
 import os
 import json
 from collections import defaultdict
-import matplotlib.pyplot as plt
-import numpy as np
+from itertools import repeat
+
+# Read buffer for gem5 stats files
+STATS_BUFFER_SIZE = 1 << 20
+
+# Report rows for each comparison, mapping display name -> gem5 stat name
+PERFORMANCE_METRICS = {
+    'Total Cycles': 'system.cpu.numCycles',
+    'Simulated Seconds': 'simSeconds',
+    'Instructions': 'system.cpu.committedInsts',
+    'IPC': 'system.cpu.ipc',
+}
+
+CACHE_STATS = {
+    'L1 Data Cache': {
+        'Overall Hit Rate': 'system.cpu.dcache.overall_hit_rate::total',
+        'Overall Miss Rate': 'system.cpu.dcache.overall_miss_rate::total',
+        'Average Miss Latency': 'system.cpu.dcache.overall_avg_miss_latency::total',
+        'Total Accesses': 'system.cpu.dcache.overall_accesses::total',
+        'Total Misses': 'system.cpu.dcache.overall_misses::total',
+    },
+    'L1 Instruction Cache': {
+        'Overall Hit Rate': 'system.cpu.icache.overall_hit_rate::total',
+        'Overall Miss Rate': 'system.cpu.icache.overall_miss_rate::total',
+        'Average Miss Latency': 'system.cpu.icache.overall_avg_miss_latency::total',
+        'Total Accesses': 'system.cpu.icache.overall_accesses::total',
+    },
+    'L2 Cache': {
+        'Overall Hit Rate': 'system.l2cache.overall_hit_rate::total',
+        'Overall Miss Rate': 'system.l2cache.overall_miss_rate::total',
+        'Average Miss Latency': 'system.l2cache.overall_avg_miss_latency::total',
+        'Total Accesses': 'system.l2cache.overall_accesses::total',
+        'Total Misses': 'system.l2cache.overall_misses::total',
+    }
+}
+
+# Bytes read/written
+MEMORY_BANDWIDTH_STATS = {
+    'Memory Bytes Read': 'system.mem_ctrl.bytes_read::total',
+    'Memory Bytes Written': 'system.mem_ctrl.bytes_written::total',
+    'Memory Read Bandwidth (MB/s)': 'system.mem_ctrl.bw_read::total',
+    'Memory Write Bandwidth (MB/s)': 'system.mem_ctrl.bw_write::total',
+}
 
 class SimulationStats:
     def __init__(self, stats_file):
@@ -24,26 +65,30 @@ class SimulationStats:
             print(f"Warning: Stats file not found: {self.stats_file}")
             return
         
-        with open(self.stats_file, 'r') as f:
+        stats = self.stats
+        with open(self.stats_file, 'rb', buffering=STATS_BUFFER_SIZE) as f:
             for line in f:
-                line = line.strip()
-                if not line or line.startswith('#') or line.startswith('---'):
+                # Parse stat lines: "stat_name   value   # description"
+                # Only the name and value are split off; the description is
+                # left in one piece.
+                parts = line.split(None, 2)
+                if len(parts) < 2 or parts[0].startswith((b'#', b'---')):
                     continue
                 
-                # Parse stat lines: "stat_name   value   # description"
-                parts = line.split()
-                if len(parts) >= 2:
-                    stat_name = parts[0]
-                    try:
-                        stat_value = float(parts[1])
-                        self.stats[stat_name] = stat_value
-                    except ValueError:
-                        self.stats[stat_name] = parts[1]
+                stat_name = parts[0].decode()
+                try:
+                    stats[stat_name] = float(parts[1])
+                except ValueError:
+                    stats[stat_name] = parts[1].decode()
     
     def get(self, stat_name, default=0):
         """Get a stat value by name"""
         return self.stats.get(stat_name, default)
     
+    def gather(self, stat_names, default=0):
+        """Get the values of several stats at once, in the order given"""
+        return list(map(self.stats.get, stat_names, repeat(default)))
+    
     def __repr__(self):
         return f"SimulationStats({len(self.stats)} stats)"
 
@@ -59,18 +104,11 @@ class ResultAnalyzer:
         print("PERFORMANCE COMPARISON")
         print("="*80)
         
-        metrics = {
-            'Total Cycles': 'system.cpu.numCycles',
-            'Simulated Seconds': 'simSeconds',
-            'Instructions': 'system.cpu.committedInsts',
-            'IPC': 'system.cpu.ipc',
-        }
+        explicit_vals = self.explicit_stats.gather(PERFORMANCE_METRICS.values())
+        gc_vals = self.gc_stats.gather(PERFORMANCE_METRICS.values())
         
         results = {}
-        for name, stat_key in metrics.items():
-            explicit_val = self.explicit_stats.get(stat_key)
-            gc_val = self.gc_stats.get(stat_key)
-            
+        for name, explicit_val, gc_val in zip(PERFORMANCE_METRICS, explicit_vals, gc_vals):
             if explicit_val and gc_val and explicit_val != 0:
                 overhead = ((gc_val - explicit_val) / explicit_val) * 100
             else:
@@ -95,38 +133,15 @@ class ResultAnalyzer:
         print("CACHE BEHAVIOR COMPARISON")
         print("="*80)
         
-        cache_stats = {
-            'L1 Data Cache': {
-                'Overall Hit Rate': 'system.cpu.dcache.overall_hit_rate::total',
-                'Overall Miss Rate': 'system.cpu.dcache.overall_miss_rate::total',
-                'Average Miss Latency': 'system.cpu.dcache.overall_avg_miss_latency::total',
-                'Total Accesses': 'system.cpu.dcache.overall_accesses::total',
-                'Total Misses': 'system.cpu.dcache.overall_misses::total',
-            },
-            'L1 Instruction Cache': {
-                'Overall Hit Rate': 'system.cpu.icache.overall_hit_rate::total',
-                'Overall Miss Rate': 'system.cpu.icache.overall_miss_rate::total',
-                'Average Miss Latency': 'system.cpu.icache.overall_avg_miss_latency::total',
-                'Total Accesses': 'system.cpu.icache.overall_accesses::total',
-            },
-            'L2 Cache': {
-                'Overall Hit Rate': 'system.l2cache.overall_hit_rate::total',
-                'Overall Miss Rate': 'system.l2cache.overall_miss_rate::total',
-                'Average Miss Latency': 'system.l2cache.overall_avg_miss_latency::total',
-                'Total Accesses': 'system.l2cache.overall_accesses::total',
-                'Total Misses': 'system.l2cache.overall_misses::total',
-            }
-        }
-        
         results = {}
-        for cache_name, stats_dict in cache_stats.items():
+        for cache_name, stats_dict in CACHE_STATS.items():
             print(f"\n{cache_name}:")
             results[cache_name] = {}
             
-            for metric_name, stat_key in stats_dict.items():
-                explicit_val = self.explicit_stats.get(stat_key)
-                gc_val = self.gc_stats.get(stat_key)
-                
+            explicit_vals = self.explicit_stats.gather(stats_dict.values())
+            gc_vals = self.gc_stats.gather(stats_dict.values())
+            
+            for metric_name, explicit_val, gc_val in zip(stats_dict, explicit_vals, gc_vals):
                 results[cache_name][metric_name] = {
                     'explicit': explicit_val,
                     'gc': gc_val
@@ -147,19 +162,11 @@ class ResultAnalyzer:
         print("MEMORY BANDWIDTH COMPARISON")
         print("="*80)
         
-        # Bytes read/written
-        stats = {
-            'Memory Bytes Read': 'system.mem_ctrl.bytes_read::total',
-            'Memory Bytes Written': 'system.mem_ctrl.bytes_written::total',
-            'Memory Read Bandwidth (MB/s)': 'system.mem_ctrl.bw_read::total',
-            'Memory Write Bandwidth (MB/s)': 'system.mem_ctrl.bw_write::total',
-        }
+        explicit_vals = self.explicit_stats.gather(MEMORY_BANDWIDTH_STATS.values())
+        gc_vals = self.gc_stats.gather(MEMORY_BANDWIDTH_STATS.values())
         
         results = {}
-        for name, stat_key in stats.items():
-            explicit_val = self.explicit_stats.get(stat_key)
-            gc_val = self.gc_stats.get(stat_key)
-            
+        for name, explicit_val, gc_val in zip(MEMORY_BANDWIDTH_STATS, explicit_vals, gc_vals):
             # Convert to MB if it's bytes
             if 'Bytes' in name:
                 explicit_val /= (1024 * 1024)
@@ -196,6 +203,9 @@ class ResultAnalyzer:
     
     def _plot_performance(self, output_dir):
         """Plot performance comparison"""
+        import matplotlib.pyplot as plt
+        import numpy as np
+        
         metrics = ['Total Cycles', 'Instructions', 'IPC']
         stat_keys = [
             'system.cpu.numCycles',
@@ -203,8 +213,8 @@ class ResultAnalyzer:
             'system.cpu.ipc'
         ]
         
-        explicit_vals = [self.explicit_stats.get(k) for k in stat_keys]
-        gc_vals = [self.gc_stats.get(k) for k in stat_keys]
+        explicit_vals = self.explicit_stats.gather(stat_keys)
+        gc_vals = self.gc_stats.gather(stat_keys)
         
         # Normalize to make comparison easier
         normalized_explicit = []
@@ -238,6 +248,9 @@ class ResultAnalyzer:
     
     def _plot_cache_behavior(self, output_dir):
         """Plot cache miss rates"""
+        import matplotlib.pyplot as plt
+        import numpy as np
+        
         caches = ['L1D', 'L1I', 'L2']
         stat_keys = [
             'system.cpu.dcache.overall_miss_rate::total',
@@ -245,8 +258,8 @@ class ResultAnalyzer:
             'system.l2cache.overall_miss_rate::total'
         ]
         
-        explicit_vals = [self.explicit_stats.get(k) * 100 for k in stat_keys]
-        gc_vals = [self.gc_stats.get(k) * 100 for k in stat_keys]
+        explicit_vals = [v * 100 for v in self.explicit_stats.gather(stat_keys)]
+        gc_vals = [v * 100 for v in self.gc_stats.gather(stat_keys)]
         
         x = np.arange(len(caches))
         width = 0.35
@@ -269,6 +282,9 @@ class ResultAnalyzer:
     
     def _plot_memory_bandwidth(self, output_dir):
         """Plot memory bandwidth comparison"""
+        import matplotlib.pyplot as plt
+        import numpy as np
+        
         operations = ['Read', 'Write']
         stat_keys = [
             'system.mem_ctrl.bytes_read::total',
@@ -276,8 +292,8 @@ class ResultAnalyzer:
         ]
         
         # Convert to MB
-        explicit_vals = [self.explicit_stats.get(k) / (1024 * 1024) for k in stat_keys]
-        gc_vals = [self.gc_stats.get(k) / (1024 * 1024) for k in stat_keys]
+        explicit_vals = [v / (1024 * 1024) for v in self.explicit_stats.gather(stat_keys)]
+        gc_vals = [v / (1024 * 1024) for v in self.gc_stats.gather(stat_keys)]
         
         x = np.arange(len(operations))
         width = 0.35
@@ -12,8 +12,15 @@ Usage:
 
 import sys
 import argparse
-from collections import namedtuple
-from typing import Dict, List, Tuple
+import heapq
+from collections import Counter, namedtuple
+from itertools import chain
+from operator import attrgetter, itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# I/O buffer for the trace and the oracle/CSV outputs; the same size as
+# reorder_deaths.py uses for the traces it produces
+TRACE_BUFFER_SIZE = 1 << 20
 
 # Data structures
 AllocationInfo = namedtuple('AllocationInfo', [
@@ -25,42 +32,90 @@ DeathInfo = namedtuple('DeathInfo', [
     'object_id', 'thread_id', 'timestamp', 'event_index'
 ])
 
-Event = namedtuple('Event', [
-    'timestamp', 'event_type', 'object_id', 'size', 
-    'site_id', 'thread_id', 'type_id', 'event_index'
+# Oracle output line for each event type, filled in with bytes %-formatting
+# (timestamp, object_id, size, site_id, thread_id)
+EVENT_LINE_FORMATS = {
+    'alloc': b"t%d: alloc(id=%d, size=%d, site=%d, thread=%d)\n",
+    'free': b"t%d: free(id=%d, size=%d, site=%d, thread=%d)\n",
+}
+
+# CSV row for each event type
+# (timestamp, object_id, size, site_id, thread_id, type_id)
+CSV_LINE_FORMATS = {
+    'alloc': b"%d,alloc,%d,%d,%d,%d,%d\n",
+    'free': b"%d,free,%d,%d,%d,%d,%d\n",
+}
+
+# Totals for an event stream
+EventSummary = namedtuple('EventSummary', [
+    'allocations', 'frees', 'bytes_allocated', 'bytes_freed', 'site_counts',
+    'unknown_deaths'
 ])
 
 
+def _write_output(output_file: Optional[str], header: bytes, lines: Iterable[bytes]):
+    """Write a header and then lines of ASCII bytes to a file or stdout."""
+    
+    # Hand all lines to the writer in one call
+    if output_file:
+        with open(output_file, 'wb', buffering=TRACE_BUFFER_SIZE) as f:
+            f.write(header)
+            f.writelines(lines)
+        return
+    
+    f = getattr(sys.stdout, 'buffer', None)
+    if f is None:
+        # sys.stdout has been replaced by a text-only stream (e.g. an
+        # io.StringIO), so decode the lines for it
+        sys.stdout.write(header.decode())
+        sys.stdout.writelines(map(bytes.decode, lines))
+        return
+    
+    sys.stdout.flush()
+    try:
+        f.write(header)
+        f.writelines(lines)
+    finally:
+        f.flush()
+
+
 class OracleBuilder:
     def __init__(self, verbose=False):
         self.verbose = verbose
         self.allocations: Dict[int, AllocationInfo] = {}
         self.deaths: Dict[int, DeathInfo] = {}
         self.event_index = 0
+        self.bytes_allocated = 0
+        # event_index of the newest allocation, i.e. the last one in the dict
+        self._last_alloc_index = -1
+        self.summary = None
+        # Raw thread-id field -> int. A trace has only a handful of threads,
+        # so every record shares one int object per thread.
+        self._thread_ids: Dict[bytes, int] = {}
         
     def parse_trace(self, trace_file: str) -> Tuple[Dict[int, AllocationInfo], Dict[int, DeathInfo]]:
         """Parse the trace file and extract allocation and death records."""
         
-        with open(trace_file, 'r') as f:
+        self.summary = None
+        
+        # Records are plain ASCII, so parse raw bytes and skip decoding
+        with open(trace_file, 'rb', buffering=TRACE_BUFFER_SIZE) as f:
             for line_num, line in enumerate(f, 1):
-                line = line.strip()
+                # split() already drops surrounding whitespace and the newline
+                parts = line.split()
                 
                 # Skip empty lines and comments
-                if not line or line.startswith('#'):
-                    continue
-                
-                parts = line.split()
-                if not parts:
+                if not parts or parts[0].startswith(b'#'):
                     continue
                 
                 record_type = parts[0]
                 
                 try:
-                    if record_type == 'N':  # Object allocation
+                    if record_type == b'N':  # Object allocation
                         self._parse_allocation(parts, is_array=False)
-                    elif record_type == 'A':  # Array allocation
+                    elif record_type == b'A':  # Array allocation
                         self._parse_allocation(parts, is_array=True)
-                    elif record_type == 'D':  # Death record
+                    elif record_type == b'D':  # Death record
                         self._parse_death(parts)
                     
                     # Increment event index for all trace records
@@ -69,7 +124,8 @@ class OracleBuilder:
                     
                 except Exception as e:
                     if self.verbose:
-                        print(f"Warning: Error parsing line {line_num}: {line}", file=sys.stderr)
+                        print(f"Warning: Error parsing line {line_num}: {line.decode(errors='replace').strip()}",
+                              file=sys.stderr)
                         print(f"  Error: {e}", file=sys.stderr)
         
         if self.verbose:
@@ -78,157 +134,207 @@ class OracleBuilder:
         
         return self.allocations, self.deaths
     
-    def _parse_allocation(self, parts: List[str], is_array: bool):
+    def _parse_allocation(self, parts: List[bytes], is_array: bool):
         """Parse allocation record: N/A <obj-id> <size> <type-id> <site-id> <length> <thread-id>"""
         if len(parts) < 7:
             return
         
+        thread_id = self._thread_ids.get(parts[6])
+        if thread_id is None:
+            thread_id = self._thread_ids[parts[6]] = int(parts[6])
+        
+        # This runs once per allocation; _make builds the record from a
+        # field tuple without the constructor's argument handling.
         object_id = int(parts[1])
-        size = int(parts[2])
-        type_id = int(parts[3])
-        site_id = int(parts[4])
-        array_length = int(parts[5])
-        thread_id = int(parts[6])
-        
-        alloc = AllocationInfo(
-            object_id=object_id,
-            size=size,
-            type_id=type_id,
-            site_id=site_id,
-            thread_id=thread_id,
-            event_index=self.event_index,
-            is_array=is_array,
-            array_length=array_length
-        )
+        alloc = AllocationInfo._make((
+            object_id,
+            int(parts[2]),      # size
+            int(parts[3]),      # type_id
+            int(parts[4]),      # site_id
+            thread_id,
+            self.event_index,
+            is_array,
+            int(parts[5])       # array_length
+        ))
         
+        # Re-inserting moves a reused object ID to the end, so the dict
+        # stays in event_index order. The byte total tracks the table.
+        previous = self.allocations.pop(object_id, None)
+        if previous is not None:
+            self.bytes_allocated -= previous.size
         self.allocations[object_id] = alloc
+        self.bytes_allocated += alloc.size
+        self._last_alloc_index = self.event_index
     
-    def _parse_death(self, parts: List[str]):
+    def _parse_death(self, parts: List[bytes]):
         """Parse death record: D <obj-id> <thread-id> <timestamp>"""
         if len(parts) < 4:
             return
         
+        thread_id = self._thread_ids.get(parts[2])
+        if thread_id is None:
+            thread_id = self._thread_ids[parts[2]] = int(parts[2])
+        
+        # Death records are the bulk of a Merlin trace's tail; build the
+        # record from a field tuple with _make.
         object_id = int(parts[1])
-        thread_id = int(parts[2])
-        timestamp = int(parts[3])
-        
-        death = DeathInfo(
-            object_id=object_id,
-            thread_id=thread_id,
-            timestamp=timestamp,
-            event_index=self.event_index
-        )
+        death = DeathInfo._make((object_id, thread_id, int(parts[3]), self.event_index))
         
+        self.deaths.pop(object_id, None)
         self.deaths[object_id] = death
     
-    def build_event_stream(self) -> List[Event]:
-        """Build a chronological event stream of alloc/free operations."""
-        
-        events = []
-        
-        # Add allocation events
-        for obj_id, alloc in self.allocations.items():
-            event = Event(
-                timestamp=alloc.event_index,  # Use event index as logical time
-                event_type='alloc',
-                object_id=obj_id,
-                size=alloc.size,
-                site_id=alloc.site_id,
-                thread_id=alloc.thread_id,
-                type_id=alloc.type_id,
-                event_index=alloc.event_index
-            )
-            events.append(event)
-        
-        # Add death/free events
-        for obj_id, death in self.deaths.items():
-            # Get allocation info for this object
-            alloc = self.allocations.get(obj_id)
-            if alloc is None:
-                if self.verbose:
-                    print(f"Warning: Death record for unknown object {obj_id}", file=sys.stderr)
-                continue
-            
-            event = Event(
-                timestamp=death.event_index,  # Use event index as logical time
-                event_type='free',
-                object_id=obj_id,
-                size=alloc.size,
-                site_id=alloc.site_id,
-                thread_id=death.thread_id,
-                type_id=alloc.type_id,
-                event_index=death.event_index
-            )
-            events.append(event)
-        
-        # Sort by timestamp (event index)
-        events.sort(key=lambda e: e.timestamp)
-        
-        return events
+    def summarize(self) -> EventSummary:
+        """Total up allocations and frees for the header and statistics.
+        
+        Computed once from the allocation and death tables, so the event
+        stream itself never has to be held in memory to be counted.
+        """
+        if self.summary is not None:
+            return self.summary
+        
+        allocations = self.allocations
+        
+        # Counter tallies in C and keeps sites in first-allocation order
+        site_counts = Counter(map(attrgetter('site_id'), allocations.values()))
+        
+        # Deaths of objects never seen allocated produce no free event; they
+        # are only counted here and reported once below
+        frees = 0
+        bytes_freed = 0
+        for alloc in map(allocations.get, self.deaths):
+            if alloc is not None:
+                frees += 1
+                bytes_freed += alloc.size
+        unknown_deaths = len(self.deaths) - frees
+        
+        if unknown_deaths and self.verbose:
+            print(f"Warning: Skipped {unknown_deaths} death records for unknown objects",
+                  file=sys.stderr)
+        
+        self.summary = EventSummary(
+            allocations=len(allocations),
+            frees=frees,
+            bytes_allocated=self.bytes_allocated,
+            bytes_freed=bytes_freed,
+            site_counts=site_counts,
+            unknown_deaths=unknown_deaths
+        )
+        return self.summary
+    
+    def build_event_stream(self) -> Iterator[tuple]:
+        """Build a chronological event stream of alloc/free operations.
+        
+        Events are (timestamp, event_type, object_id, size, site_id,
+        thread_id, type_id) tuples produced lazily from the allocation and
+        death tables; nothing is materialized. The stream can be consumed
+        once, so call this again for each output.
+        """
+        
+        self.summarize()
+        allocations = self.allocations
+        deaths = self.deaths
+        
+        # Allocation events (event index is used as logical time)
+        alloc_events = (
+            (alloc.event_index, 'alloc', obj_id, alloc.size,
+             alloc.site_id, alloc.thread_id, alloc.type_id)
+            for obj_id, alloc in allocations.items()
+        )
+        
+        # Free events, for deaths of objects we saw allocated
+        free_events = (
+            (death.event_index, 'free', death.object_id, alloc.size,
+             alloc.site_id, death.thread_id, alloc.type_id)
+            for death, alloc in zip(deaths.values(), map(allocations.get, deaths))
+            if alloc is not None
+        )
+        
+        # Both tables are kept in event_index order, so each generator is
+        # already sorted and the two only need merging. When every free comes
+        # after the last allocation (deaths appended at the end of the trace)
+        # they can simply be chained.
+        last_alloc = self._last_alloc_index
+        first_free = next((death.event_index for death in deaths.values()
+                           if death.object_id in allocations), None)
+        if first_free is None or first_free > last_alloc:
+            return chain(alloc_events, free_events)
+        
+        return heapq.merge(alloc_events, free_events)
     
-    def print_event_stream(self, events: List[Event], output_file=None):
-        """Print the event stream in a human-readable format."""
-        
-        f = open(output_file, 'w') if output_file else sys.stdout
-        
-        try:
-            # Print header
-            print("# Oracle Event Stream", file=f)
-            print("# Format: t<event_index>: <event_type>(id=<obj_id>, size=<bytes>, site=<site_id>, thread=<thread_id>)", file=f)
-            print(f"# Total events: {len(events)}", file=f)
-            print(f"# Allocations: {sum(1 for e in events if e.event_type == 'alloc')}", file=f)
-            print(f"# Frees: {sum(1 for e in events if e.event_type == 'free')}", file=f)
-            print(file=f)
-            
-            # Print events
-            for event in events:
-                print(f"t{event.timestamp}: {event.event_type}(id={event.object_id}, "
-                      f"size={event.size}, site={event.site_id}, thread={event.thread_id})", 
-                      file=f)
-        
-        finally:
-            if output_file:
-                f.close()
+    def print_event_stream(self, events: Optional[Iterable[tuple]] = None, output_file=None):
+        """Print the event stream in a human-readable format.
+        
+        events defaults to a fresh build_event_stream(), which is written
+        as it is produced. Events passed in are counted for the header
+        before they are written, so they are held in memory.
+        """
+        
+        if events is None:
+            summary = self.summarize()
+            n_allocs = summary.allocations
+            n_frees = summary.frees
+            events = self.build_event_stream()
+        else:
+            events = list(events)
+            n_frees = sum(1 for event in events if event[1] == 'free')
+            n_allocs = len(events) - n_frees
+        
+        # The oracle is pure ASCII, so format it as bytes
+        header = (b"# Oracle Event Stream\n"
+                  b"# Format: t<event_index>: <event_type>(id=<obj_id>, size=<bytes>, site=<site_id>, thread=<thread_id>)\n"
+                  b"# Total events: %d\n"
+                  b"# Allocations: %d\n"
+                  b"# Frees: %d\n"
+                  b"\n" % (n_allocs + n_frees, n_allocs, n_frees))
+        
+        line_formats = EVENT_LINE_FORMATS
+        _write_output(output_file, header, (
+            line_formats[event_type] % (timestamp, object_id, size, site_id, thread_id)
+            for timestamp, event_type, object_id, size, site_id, thread_id, _ in events
+        ))
     
-    def export_csv(self, events: List[Event], output_file: str):
-        """Export event stream as CSV for analysis."""
-        
-        with open(output_file, 'w') as f:
-            # Write header
-            print("timestamp,event_type,object_id,size,site_id,thread_id,type_id", file=f)
-            
-            # Write events
-            for event in events:
-                print(f"{event.timestamp},{event.event_type},{event.object_id},"
-                      f"{event.size},{event.site_id},{event.thread_id},{event.type_id}", 
-                      file=f)
+    def export_csv(self, events: Optional[Iterable[tuple]] = None, output_file=None):
+        """Export event stream as CSV for analysis.
+        
+        events defaults to a fresh build_event_stream().
+        """
+        
+        if events is None:
+            events = self.build_event_stream()
+        
+        line_formats = CSV_LINE_FORMATS
+        _write_output(
+            output_file,
+            b"timestamp,event_type,object_id,size,site_id,thread_id,type_id\n",
+            (line_formats[event_type] % (timestamp, object_id, size, site_id, thread_id, type_id)
+             for timestamp, event_type, object_id, size, site_id, thread_id, type_id in events)
+        )
     
-    def print_statistics(self, events: List[Event]):
+    def print_statistics(self):
         """Print statistics about the oracle."""
         
-        allocs = [e for e in events if e.event_type == 'alloc']
-        frees = [e for e in events if e.event_type == 'free']
+        summary = self.summarize()
+        n_allocs = summary.allocations
+        n_frees = summary.frees
         
-        total_allocated = sum(e.size for e in allocs)
-        total_freed = sum(e.size for e in frees)
+        total_allocated = summary.bytes_allocated
+        total_freed = summary.bytes_freed
         
         print(f"\n=== Oracle Statistics ===", file=sys.stderr)
-        print(f"Total events: {len(events)}", file=sys.stderr)
-        print(f"Allocations: {len(allocs)}", file=sys.stderr)
-        print(f"Frees: {len(frees)}", file=sys.stderr)
-        print(f"Live objects (not freed): {len(allocs) - len(frees)}", file=sys.stderr)
+        print(f"Total events: {n_allocs + n_frees}", file=sys.stderr)
+        print(f"Allocations: {n_allocs}", file=sys.stderr)
+        print(f"Frees: {n_frees}", file=sys.stderr)
+        print(f"Live objects (not freed): {n_allocs - n_frees}", file=sys.stderr)
         print(f"Total bytes allocated: {total_allocated}", file=sys.stderr)
         print(f"Total bytes freed: {total_freed}", file=sys.stderr)
         print(f"Live bytes: {total_allocated - total_freed}", file=sys.stderr)
         
         # Site statistics
-        site_counts = {}
-        for alloc in allocs:
-            site_counts[alloc.site_id] = site_counts.get(alloc.site_id, 0) + 1
+        site_counts = summary.site_counts
         
         print(f"\nAllocation sites: {len(site_counts)}", file=sys.stderr)
         print(f"Most active sites:", file=sys.stderr)
-        for site, count in sorted(site_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
+        for site, count in heapq.nlargest(5, site_counts.items(), key=itemgetter(1)):
             print(f"  Site {site}: {count} allocations", file=sys.stderr)
 
 
@@ -249,20 +355,20 @@ def main():
     # Build oracle
     builder = OracleBuilder(verbose=args.verbose)
     builder.parse_trace(args.input_trace)
-    events = builder.build_event_stream()
     
-    # Output results
-    builder.print_event_stream(events, args.output)
+    # Output results. Each output builds its own pass over the stream, so
+    # the events are never held in memory all at once.
+    builder.print_event_stream(output_file=args.output)
     
     # Export CSV if requested
     if args.csv:
-        builder.export_csv(events, args.csv)
+        builder.export_csv(output_file=args.csv)
         if args.verbose:
             print(f"CSV exported to {args.csv}", file=sys.stderr)
     
     # Print statistics if requested
     if args.stats:
-        builder.print_statistics(events)
+        builder.print_statistics()
 
 
 if __name__ == '__main__':
@@ -16,9 +16,46 @@ Usage:
     python3 reorder_deaths.py <input_trace> <output_trace> [--verbose]
 """
 
+import os
 import sys
+import math
+import stat
+import shutil
 import argparse
-from typing import List, Tuple
+import tempfile
+from typing import BinaryIO, Iterable, Iterator, List, Tuple
+
+# I/O buffer for the input trace, its spooled copy and the output. 1 MiB
+# rather than the default 8 KiB; larger buffers measured no faster. Kept
+# the same as in build_oracle.py, which reads the same traces.
+TRACE_BUFFER_SIZE = 1 << 20
+
+# Record types that advance the logical clock: method entry (M), method
+# exit (E) and exception exit (X)
+CLOCK_RECORD_TYPES = frozenset((b'M', b'E', b'X'))
+
+# Record types that allocate an object or array
+ALLOCATION_RECORD_TYPES = frozenset((b'N', b'A'))
+
+# How the first pass classifies each trace line
+LINE_RECORD = 0     # copied through unchanged
+LINE_CLOCK = 1      # copied through; advances the logical clock (M/E/X)
+LINE_DEATH = 2      # death record, moved by the merge (malformed ones are dropped)
+
+# Death records are copied into one bytearray arena, each ending in a
+# newline, and tracked by a single int each:
+# (timestamp << DEATH_OFFSET_BITS) | offset of the line in the arena.
+# Sorting those ints orders deaths by timestamp and, within a
+# timestamp, by trace order. Offsets must fit in the low bits, so the
+# death records of one trace are limited to 1 TiB.
+DEATH_OFFSET_BITS = 40
+DEATH_OFFSET_MASK = (1 << DEATH_OFFSET_BITS) - 1
+
+
+def _arena_line(arena: bytearray, death_key: int) -> bytearray:
+    """Return the death record line a packed death key points at."""
+    start = death_key & DEATH_OFFSET_MASK
+    return arena[start:arena.find(b'\n', start) + 1]
 
 
 class TraceReorderer:
@@ -26,159 +63,277 @@ class TraceReorderer:
         self.verbose = verbose
         self.logical_clock = 0
         
-    def reorder_trace(self, input_file: str, output_file: str):
+    def reorder_trace(self, input_file: str, output_file: str, validate: bool = False):
         """
         Reorder death records into correct temporal positions.
         
         Algorithm:
-        1. Read all trace records, tracking logical clock
-        2. Separate death records (D) from other records
-        3. Build mapping of logical_time -> line_index for non-death records
-        4. Insert death records at appropriate positions
-        """
+        1. Scan the trace once, tracking the logical clock: collect death
+           records (D) and note which other lines advance the clock
+        2. Sort death records by timestamp
+        3. Stream the trace a second time, copying every non-death record
+           to the output and inserting each death record once the clock
+           reaches its timestamp
         
-        # Read entire trace
-        with open(input_file, 'r') as f:
-            lines = f.readlines()
+        Only the death records and one byte per line are held in memory;
+        the rest of the trace is never loaded at once.
         
-        if self.verbose:
-            print(f"Read {len(lines)} lines from {input_file}", file=sys.stderr)
+        With validate=True the output is checked as it is written (see
+        validate_trace) rather than read back afterwards.
+        """
         
-        # Separate death records from other records
-        trace_records = []  # (logical_time, line_text)
-        death_records = []  # (timestamp, line_text)
+        death_records = []  # packed (timestamp, arena offset) keys
+        death_arena = bytearray()  # text of every death record
+        line_kinds = bytearray()  # LINE_* classification of every line
         
         current_logical_time = 0
+        line_count = 0
         
-        for line in lines:
-            stripped = line.strip()
-            
-            # Keep empty lines and comments as-is (no logical time)
-            if not stripped or stripped.startswith('#'):
-                trace_records.append((current_logical_time, line))
-                continue
-            
-            parts = stripped.split()
-            if not parts:
-                trace_records.append((current_logical_time, line))
-                continue
+        # Bound methods for the per-line loop
+        add_kind = line_kinds.append
+        add_death = death_records.append
+        verbose = self.verbose
+        
+        # First pass: find the death records and where the clock ticks.
+        # Records are plain ASCII, so work on raw bytes and skip decoding.
+        with self._open_trace(input_file, output_file) as src:
+            for line_count, line in enumerate(src, 1):
+                stripped = line.strip()
+                
+                # Keep empty lines and comments as-is (no logical time)
+                if not stripped or stripped.startswith(b'#'):
+                    add_kind(LINE_RECORD)
+                    continue
+                
+                # Only death records need more than the record type
+                parts = stripped.split(None, 1)
+                if not parts:
+                    add_kind(LINE_RECORD)
+                    continue
+                
+                record_type = parts[0]
+                
+                if record_type == b'D':
+                    # Death record: D <obj-id> <thread-id> <timestamp>
+                    parts = stripped.split()
+                    if len(parts) >= 4:
+                        timestamp = int(parts[3])
+                        offset = len(death_arena)
+                        if offset > DEATH_OFFSET_MASK:
+                            raise ValueError(f"Death records in {input_file} exceed "
+                                             f"{DEATH_OFFSET_MASK + 1} bytes")
+                        add_death((timestamp << DEATH_OFFSET_BITS) | offset)
+                        death_arena += line
+                        if not line.endswith(b'\n'):
+                            # The final line may lack one; deaths move, so add it
+                            death_arena += b'\n'
+                    else:
+                        if verbose:
+                            print(f"Warning: Malformed death record: {stripped.decode(errors='replace')}", file=sys.stderr)
+                    add_kind(LINE_DEATH)
+                else:
+                    # Regular record - track logical clock
+                    # Clock increments at M (method entry) and E (method exit)
+                    if record_type in CLOCK_RECORD_TYPES:  # X is exception exit, also increments
+                        current_logical_time += 1
+                        add_kind(LINE_CLOCK)
+                    else:
+                        add_kind(LINE_RECORD)
+        
+            trace_record_count = line_count - line_kinds.count(LINE_DEATH)
             
-            record_type = parts[0]
+            if self.verbose:
+                print(f"Read {line_count} lines from {input_file}", file=sys.stderr)
+                print(f"Found {trace_record_count} trace records", file=sys.stderr)
+                print(f"Found {len(death_records)} death records to reorder", file=sys.stderr)
+                print(f"Max logical time: {current_logical_time}", file=sys.stderr)
             
-            if record_type == 'D':
-                # Death record: D <obj-id> <thread-id> <timestamp>
-                if len(parts) >= 4:
-                    timestamp = int(parts[3])
-                    death_records.append((timestamp, line))
-                else:
-                    if self.verbose:
-                        print(f"Warning: Malformed death record: {stripped}", file=sys.stderr)
-            else:
-                # Regular record - track logical clock
-                # Clock increments at M (method entry) and E (method exit)
-                if record_type in ['M', 'E', 'X']:  # X is exception exit, also increments
-                    current_logical_time += 1
-                
-                trace_records.append((current_logical_time, line))
+            # Second pass: merge death records into trace at correct positions
+            # and write output as it is produced
+            src.seek(0)
+            with open(output_file, 'wb', buffering=TRACE_BUFFER_SIZE) as f:
+                trace_records = self._iter_trace_records(src, line_kinds)
+                merged = self._merge_records(trace_records, death_records, death_arena)
+                if validate:
+                    merged = self._validate_lines(merged)
+                f.writelines(merged)
         
         if self.verbose:
-            print(f"Found {len(trace_records)} trace records", file=sys.stderr)
-            print(f"Found {len(death_records)} death records to reorder", file=sys.stderr)
-            print(f"Max logical time: {current_logical_time}", file=sys.stderr)
+            print(f"Wrote {trace_record_count + len(death_records)} lines to {output_file}",
+                  file=sys.stderr)
+    
+    def _open_trace(self, input_file: str, output_file: str) -> BinaryIO:
+        """
+        Open the input trace so that it can be read twice.
         
-        # Merge death records into trace at correct positions
-        merged = self._merge_records(trace_records, death_records)
+        A pipe cannot be rewound, and reordering a trace in place would
+        truncate it when the output is opened before the second pass. In
+        those cases the trace is first copied to a temporary file, and that
+        copy is read instead.
+        """
         
-        # Write output
-        with open(output_file, 'w') as f:
-            for line in merged:
-                f.write(line)
+        f = open(input_file, 'rb', buffering=TRACE_BUFFER_SIZE)
+        try:
+            info = os.fstat(f.fileno())
+            if stat.S_ISREG(info.st_mode):
+                try:
+                    in_place = os.path.samestat(info, os.stat(output_file))
+                except FileNotFoundError:
+                    in_place = False
+                if not in_place:
+                    return f
+        except BaseException:
+            f.close()
+            raise
         
-        if self.verbose:
-            print(f"Wrote {len(merged)} lines to {output_file}", file=sys.stderr)
+        with f:
+            spool = tempfile.TemporaryFile(buffering=TRACE_BUFFER_SIZE)
+            shutil.copyfileobj(f, spool, TRACE_BUFFER_SIZE)
+        spool.seek(0)
+        return spool
     
-    def _merge_records(self, trace_records: List[Tuple[int, str]], 
-                      death_records: List[Tuple[int, str]]) -> List[str]:
+    def _iter_trace_records(self, lines: Iterable[bytes],
+                            line_kinds: bytearray) -> Iterator[Tuple[int, bytes]]:
+        """
+        Yield (logical_time, line_text) for each non-death line of a trace,
+        using the line classification from the first pass.
+        
+        Raises ValueError if the trace no longer has the lines the first
+        pass classified, i.e. it changed between the two passes.
+        """
+        
+        logical_time = 0
+        line_count = 0
+        lines = iter(lines)
+        # line_kinds goes first so that zip stops without taking a line
+        # from the trace once the classification runs out
+        for kind, line in zip(line_kinds, lines):
+            line_count += 1
+            if kind == LINE_CLOCK:
+                logical_time += 1
+            elif kind == LINE_DEATH:
+                continue
+            yield logical_time, line
+        
+        if line_count != len(line_kinds) or next(lines, None) is not None:
+            raise ValueError(f"Trace changed while being reordered: the first pass "
+                             f"read {len(line_kinds)} lines, the second pass did not")
+    
+    def _merge_records(self, trace_records: Iterable[Tuple[int, bytes]], 
+                      death_records: List[int], death_arena: bytearray) -> Iterator[bytes]:
         """
         Merge death records into trace records at correct temporal positions.
         
         Death records should be inserted AFTER the trace record at their timestamp.
         For example, a death at timestamp 4 should appear after the record where
         logical_clock becomes 4 (typically an M or E record).
+        
+        death_records holds packed keys into death_arena (see DEATH_OFFSET_BITS).
         """
         
-        # Sort death records by timestamp
-        death_records.sort(key=lambda x: x[0])
+        # Sort death records by timestamp (ties stay in trace order)
+        death_records.sort()
         
-        merged = []
         death_idx = 0
+        death_count = len(death_records)
+        verbose = self.verbose
+        
+        # Timestamp of the next death to insert. Most records have no death
+        # due after them, and this keeps that case to a single compare.
+        next_death_time = death_records[0] >> DEATH_OFFSET_BITS if death_records else math.inf
         
-        for i, (logical_time, line) in enumerate(trace_records):
+        line = b'\n'
+        for logical_time, line in trace_records:
             # Add the current trace record
-            merged.append(line)
+            yield line
+            
+            if next_death_time > logical_time:
+                continue
+            
+            # A final trace line without a newline must not run into the deaths
+            if not line.endswith(b'\n'):
+                yield b'\n'
             
             # Insert all death records that should occur at or before this logical time
-            while death_idx < len(death_records):
-                death_time, death_line = death_records[death_idx]
+            while death_idx < death_count:
+                death_key = death_records[death_idx]
+                death_time = death_key >> DEATH_OFFSET_BITS
                 
                 # Death should be inserted after we reach its timestamp
                 if death_time <= logical_time:
-                    merged.append(death_line)
+                    yield _arena_line(death_arena, death_key)
                     death_idx += 1
-                    if self.verbose and death_time < logical_time:
+                    if verbose and death_time < logical_time:
                         print(f"Debug: Inserting death at timestamp {death_time} " 
                               f"after record at logical time {logical_time}",
                               file=sys.stderr)
                 else:
                     break
+            
+            next_death_time = (death_records[death_idx] >> DEATH_OFFSET_BITS
+                               if death_idx < death_count else math.inf)
         
         # Add any remaining death records at the end (shouldn't happen with valid traces)
-        while death_idx < len(death_records):
-            death_time, death_line = death_records[death_idx]
-            if self.verbose:
-                print(f"Warning: Death at timestamp {death_time} inserted at end", 
+        if death_idx < death_count and not line.endswith(b'\n'):
+            yield b'\n'
+        while death_idx < death_count:
+            death_key = death_records[death_idx]
+            if verbose:
+                print(f"Warning: Death at timestamp {death_key >> DEATH_OFFSET_BITS} inserted at end", 
                       file=sys.stderr)
-            merged.append(death_line)
+            yield _arena_line(death_arena, death_key)
             death_idx += 1
-        
-        return merged
     
     def validate_trace(self, trace_file: str):
         """Validate that death records are properly ordered."""
         
-        with open(trace_file, 'r') as f:
-            lines = f.readlines()
+        with open(trace_file, 'rb', buffering=TRACE_BUFFER_SIZE) as f:
+            for _ in self._validate_lines(f):
+                pass
+    
+    def _validate_lines(self, lines: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass trace lines through unchanged while checking that death records
+        are properly ordered; prints the results once the lines run out.
+        
+        Lets reorder_trace validate its output as it is written instead of
+        reading the finished file back.
+        """
         
         logical_clock = 0
         deaths_after_birth = 0
         deaths_in_order = 0
+        malformed_records = 0
         
         allocated_objects = {}  # obj_id -> allocation_time
         
         for line in lines:
+            yield line
+            
             stripped = line.strip()
-            if not stripped or stripped.startswith('#'):
+            if not stripped or stripped.startswith(b'#'):
                 continue
             
-            parts = stripped.split()
+            # Only allocation and death records need more than the record type
+            parts = stripped.split(None, 1)
             if not parts:
                 continue
             
             record_type = parts[0]
             
-            # Track logical clock
-            if record_type in ['M', 'E', 'X']:
-                logical_clock += 1
-            
-            # Track allocations
-            if record_type in ['N', 'A']:
-                obj_id = int(parts[1])
-                allocated_objects[obj_id] = logical_clock
-            
-            # Validate deaths
-            if record_type == 'D':
-                obj_id = int(parts[1])
-                death_time = int(parts[3])
+            # Validate deaths. Checked first: death lines from reorder_trace
+            # are bytearrays, which cannot be looked up in the sets below.
+            if record_type == b'D':
+                parts = stripped.split()
+                try:
+                    obj_id = int(parts[1])
+                    death_time = int(parts[3])
+                except (IndexError, ValueError):
+                    # Report rather than raise: the line has already been passed on
+                    malformed_records += 1
+                    print(f"ERROR: Malformed record: {stripped.decode(errors='replace')}",
+                          file=sys.stderr)
+                    continue
                 
                 # Check death is after allocation
                 if obj_id in allocated_objects:
@@ -195,11 +350,29 @@ class TraceReorderer:
                 else:
                     print(f"ERROR: Death at timestamp {death_time} appears "
                           f"at logical time {logical_clock}", file=sys.stderr)
+            
+            # Track logical clock
+            elif record_type in CLOCK_RECORD_TYPES:
+                logical_clock += 1
+            
+            # Track allocations
+            elif record_type in ALLOCATION_RECORD_TYPES:
+                parts = stripped.split()
+                try:
+                    obj_id = int(parts[1])
+                except (IndexError, ValueError):
+                    malformed_records += 1
+                    print(f"ERROR: Malformed record: {stripped.decode(errors='replace')}",
+                          file=sys.stderr)
+                    continue
+                allocated_objects[obj_id] = logical_clock
         
         print(f"\n=== Validation Results ===", file=sys.stderr)
         print(f"Deaths correctly ordered: {deaths_in_order}", file=sys.stderr)
         print(f"Deaths after allocation: {deaths_after_birth}", file=sys.stderr)
         print(f"Total objects allocated: {len(allocated_objects)}", file=sys.stderr)
+        if malformed_records:
+            print(f"Malformed records: {malformed_records}", file=sys.stderr)
 
 
 def main():
@@ -215,15 +388,11 @@ def main():
     
     args = parser.parse_args()
     
-    # Reorder trace
+    # Reorder trace, validating the output as it is written if requested
     reorderer = TraceReorderer(verbose=args.verbose)
-    reorderer.reorder_trace(args.input_trace, args.output_trace)
+    reorderer.reorder_trace(args.input_trace, args.output_trace, validate=args.validate)
     
     print(f"Successfully reordered trace: {args.output_trace}")
-    
-    # Validate if requested
-    if args.validate:
-        reorderer.validate_trace(args.output_trace)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,119 @@
+# pytest tests for reorder_deaths.py
+#     python3 -m pytest reorder_deaths_tests.py
+import os
+import subprocess
+import sys
+
+import pytest
+
+import reorder_deaths
+from reorder_deaths import TraceReorderer, LINE_CLOCK, LINE_RECORD
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "reorder_deaths.py")
+
+# Merlin trace with its death records appended at the end.
+# The logical clock reads 1, 2, 3, 4 after each M/E record in turn.
+TRACE = (b"M 1 1 1\n"
+         b"N 10 16 1 2 0 1\n"
+         b"M 2 1 1\n"
+         b"E 2 1\n"
+         b"N 11 24 1 3 0 1\n"
+         b"E 1 1\n"
+         b"D 10 1 2\n"
+         b"D 11 1 4\n")
+
+# The same trace with each death after the record where the clock reaches it
+REORDERED = (b"M 1 1 1\n"
+             b"N 10 16 1 2 0 1\n"
+             b"M 2 1 1\n"
+             b"D 10 1 2\n"
+             b"E 2 1\n"
+             b"N 11 24 1 3 0 1\n"
+             b"E 1 1\n"
+             b"D 11 1 4\n")
+
+def reorder_bytes( trace, tmp_path, **kwargs ):
+    # Reorders the given trace bytes through temporary files.
+    input_path = tmp_path.joinpath("trace")
+    output_path = tmp_path.joinpath("trace.reordered")
+    input_path.write_bytes(trace)
+    TraceReorderer().reorder_trace( str(input_path), str(output_path), **kwargs )
+    return output_path.read_bytes()
+
+def test_reorder( tmp_path ):
+    assert reorder_bytes(TRACE, tmp_path) == REORDERED
+
+def test_reorder_in_place( tmp_path ):
+    # Output over the input must not truncate the trace before it is read
+    trace_path = tmp_path.joinpath("trace")
+    trace_path.write_bytes(TRACE)
+    TraceReorderer().reorder_trace( str(trace_path), str(trace_path) )
+    assert trace_path.read_bytes() == REORDERED
+
+def test_reorder_in_place_through_symlink( tmp_path ):
+    trace_path = tmp_path.joinpath("trace")
+    link_path = tmp_path.joinpath("link")
+    trace_path.write_bytes(TRACE)
+    os.symlink( str(trace_path), str(link_path) )
+    TraceReorderer().reorder_trace( str(trace_path), str(link_path) )
+    assert trace_path.read_bytes() == REORDERED
+
+def test_reorder_piped_input( tmp_path ):
+    # A pipe cannot be read twice; the trace is copied to a temporary file
+    output_path = tmp_path.joinpath("trace.reordered")
+    proc = subprocess.run( [ sys.executable, SCRIPT, "/dev/stdin", str(output_path) ],
+                           input = TRACE,
+                           stdout = subprocess.PIPE,
+                           stderr = subprocess.PIPE )
+    assert proc.returncode == 0, proc.stderr
+    assert output_path.read_bytes() == REORDERED
+
+def test_second_pass_with_fewer_lines():
+    line_kinds = bytearray([ LINE_CLOCK, LINE_RECORD ])
+    records = TraceReorderer()._iter_trace_records( iter([ b"M 1 1 1\n" ]), line_kinds )
+    with pytest.raises(ValueError, match="changed while being reordered"):
+        list(records)
+
+def test_second_pass_with_more_lines():
+    line_kinds = bytearray([ LINE_CLOCK, LINE_RECORD ])
+    lines = [ b"M 1 1 1\n", b"N 10 16 1 2 0 1\n", b"E 1 1\n" ]
+    records = TraceReorderer()._iter_trace_records( iter(lines), line_kinds )
+    with pytest.raises(ValueError, match="changed while being reordered"):
+        list(records)
+
+def test_final_death_without_newline( tmp_path ):
+    # The last death record moves up and must not run into the next line
+    assert reorder_bytes(TRACE.rstrip(b"\n"), tmp_path) == REORDERED
+
+def test_final_record_without_newline_before_deaths( tmp_path ):
+    trace = b"D 10 1 1\nM 1 1 1"
+    assert reorder_bytes(trace, tmp_path) == b"M 1 1 1\nD 10 1 1\n"
+
+def test_final_record_without_newline_before_leftover_deaths( tmp_path ):
+    # Deaths past the end of the clock are appended after the last record
+    trace = b"D 10 1 5\nM 1 1 1"
+    assert reorder_bytes(trace, tmp_path) == b"M 1 1 1\nD 10 1 5\n"
+
+def test_validate_reports_malformed_records( tmp_path, capsys ):
+    # Malformed records are counted, not raised, so the output is complete
+    trace = (b"M 1 1 1\n"
+             b"N\n"
+             b"N 10 16 1 2 0 1\n"
+             b"E 1 1\n"
+             b"D x 1 2\n"
+             b"D 10 1 2\n")
+    # The deaths are already in place, so the trace comes out unchanged
+    assert reorder_bytes(trace, tmp_path, validate = True) == trace
+    out, err = capsys.readouterr()
+    assert "ERROR: Malformed record: N\n" in err
+    assert "ERROR: Malformed record: D x 1 2\n" in err
+    assert "Malformed records: 2\n" in err
+    assert "Deaths correctly ordered: 1\n" in err
+
+def test_death_arena_offset_limit( tmp_path, monkeypatch ):
+    # Packed death keys hold the arena offset in DEATH_OFFSET_BITS bits;
+    # shrink the limit so the second death record ("D 11", at offset 9)
+    # no longer fits
+    monkeypatch.setattr( reorder_deaths, "DEATH_OFFSET_MASK", 8 )
+    with pytest.raises(ValueError, match="exceed 9 bytes"):
+        reorder_bytes(TRACE, tmp_path)